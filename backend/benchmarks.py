@@ -0,0 +1,358 @@
+"""
+Micro-benchmarks for the Slipstream Control Plane backend.
+
+Run from the backend directory:
+
+    python benchmarks.py traffic-memory --records 1000000
+    python benchmarks.py broadcast-batching --rate 500 --tick-ms 100
+    python benchmarks.py swarm-overhead --swarms 500
+    python benchmarks.py token-counting
+    python benchmarks.py token-accuracy
+    python benchmarks.py snapshot --swarms 200 --cache 10000
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from script_data import SCRIPT
+from traffic import TrafficRecord
+from hub import ConnectionManager, SwarmRegistry
+from tokens import BPETokenCounter, _PRETOKENIZE
+from gemini_quantizer import QuantizationCache
+from snapshot import SnapshotManager
+
+ANCHORS = ["RequestTask", "InformStatus", "EvalPass", "ActionFetch", "NONE"]
+
+# Accuracy samples with their token counts under tiktoken's cl100k_base
+# encoding (tiktoken 0.14.0), the reference the bundled ranks must reproduce
+TOKEN_SAMPLES = [
+    ('Scaling the checkout service to 12 replicas ahead of the flash sale at 18:00 UTC.', 20),
+    ('Cache hit ratio dropped to 61% after the last deploy; investigating eviction settings.', 17),
+    ('Can you confirm the migration script is idempotent before I run it against staging?', 17),
+    ('Rollback complete. Error rate is back under 0.2% and p99 latency is 340ms.', 23),
+    ('The flaky test in payments/test_refunds.py fails roughly one run in twenty.', 17),
+    ('I will summarize the incident timeline and share it with the on-call channel.', 15),
+    ('Blocked: the vendor API returns HTTP 429 after 50 requests per minute.', 16),
+    ('Draft the release notes for v2.14.0, highlighting the new export formats.', 18),
+    ('Disk usage on db-replica-3 is at 91%. Recommend archiving logs older than 30 days.', 24),
+    ('Retrying the job with exponential backoff, max 5 attempts.', 14),
+    ('User reported that the dashboard shows stale data after switching workspaces.', 13),
+    ('Found the root cause: a race between the session refresh and the logout handler.', 16),
+    ('Please review the Terraform plan; it destroys and recreates the load balancer.', 17),
+    ('Translation pipeline finished: 1,204 strings updated across 9 locales.', 15),
+    ('Memory usage grows by ~40MB per hour in the worker pool; suspect an unbounded cache.', 20),
+    ('Schedule a follow-up with the security team about rotating the signing keys.', 14),
+    ('{"type": "deploy", "service": "checkout", "replicas": 12, "region": "us-east-1"}', 28),
+    ('{"type": "metric_alert", "name": "cache_hit_ratio", "value": 0.61, "threshold": 0.8}', 31),
+    ('{"type": "rollback", "release": "2024.06.3", "reason": "error_rate_spike"}', 26),
+    ('{"type": "test_result", "suite": "payments", "passed": 312, "failed": 1, "flaky": ["test_refunds"]}', 34),
+    ('{"type": "rate_limit", "status": 429, "retry_after_s": 60}', 21),
+    ('{"type": "disk_alert", "host": "db-replica-3", "usage_pct": 91}', 25),
+    ('{"type": "task", "id": "T-4821", "assignee": "Executor", "priority": "high", "due": "2024-07-01"}', 39),
+    ('{"type": "query", "sql": "SELECT id, email FROM users WHERE created_at > NOW() - INTERVAL \'7 days\'"}', 29),
+    ('{"from": "Planner", "to": "Executor", "content": "Split the ingestion job into hourly partitions.", "timestamp": "now"}', 31),
+    ('{"from": "QA", "to": "Backend", "content": "Regression suite green on build 7781.", "timestamp": "now"}', 31),
+    ('def retry(fn, attempts=3):\n    for i in range(attempts):\n        try:\n            return fn()\n        except TimeoutError:\n            time.sleep(2 ** i)\n', 36),
+    ('const total = items.reduce((sum, item) => sum + item.price * item.qty, 0);', 22),
+    ('ERROR 2024-06-12T08:14:03Z worker-7 OOMKilled: container exceeded memory limit 512Mi', 30),
+    ('git cherry-pick 4f2a9c1 && git push origin release/2.14', 21),
+    ('kubectl rollout status deployment/checkout -n prod --timeout=120s', 14),
+    ('Traceback (most recent call last):\n  File "app.py", line 42, in handler\n    user = users[user_id]\nKeyError: \'u_1093\'', 37),
+    ('SLIP v1 Executor Planner REQ-REVIEW pr=892 focus=security', 16),
+    ('SLIP v1 QA Executor RES-TEST-PASS suite=auth coverage=94', 17),
+    ("Les tests d'intégration échouent depuis la mise à jour de la bibliothèque.", 23),
+    ('Die Bereitstellung wurde um 15 Minuten verschoben.', 13),
+    ('Latency budget: 120ms p50 / 450ms p99 — currently 95ms / 510ms ⚠️', 28),
+    ('ACK. Proceeding.', 5),
+    ('    \n\n\t  trailing whitespace   \n', 5),
+]
+
+
+def _wire_payload(i: int) -> str:
+    """A serialized traffic message, as relayed through /ws/hub by an agent."""
+    scenario = SCRIPT[i % len(SCRIPT)]
+    anchor = ANCHORS[i % len(ANCHORS)]
+    return json.dumps({
+        "type": "traffic",
+        "id": str(random.randint(10000, 99999)),
+        "timestamp": "Now",
+        "src": scenario["src"],
+        "dst": scenario["dst"],
+        "thought": scenario["thought"],
+        "slip_wire": f"{anchor}(step:{i % 50})",
+        "anchor": anchor,
+        "json_equiv": json.dumps(scenario["json_equiv"]),
+        "gemini_reasoning": None,
+        "metrics": {"json_tokens": 17.0, "slip_tokens": 2, "savings_pct": 88.2},
+        "advanced": {"latency_ms": random.randint(20, 150), "status": "success", "recovery_time_ms": 0},
+    })
+
+
+def _max_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _payload_pool():
+    # A small pool of distinct payloads; json.loads still allocates fresh
+    # strings per message, exactly like messages arriving over the socket.
+    random.seed(0)
+    return [_wire_payload(i) for i in range(1000)]
+
+
+def _build_dicts(n: int) -> int:
+    payloads = _payload_pool()
+    gc.collect()
+    before = _max_rss_bytes()
+    items = [json.loads(payloads[i % 1000]) for i in range(n)]
+    # Measured while `items` is still alive
+    grown = _max_rss_bytes() - before
+    del items
+    return grown
+
+
+def _build_records(n: int) -> int:
+    payloads = _payload_pool()
+    gc.collect()
+    before = _max_rss_bytes()
+    items = [TrafficRecord.from_wire(json.loads(payloads[i % 1000])) for i in range(n)]
+    # Measured while `items` is still alive
+    grown = _max_rss_bytes() - before
+    del items
+    return grown
+
+
+def _measure(build, n: int) -> float:
+    """Bytes per item retained after building n items, in a fresh process."""
+    # A fresh process per variant so peak RSS reflects only that variant
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(build, (n,)) / n
+
+
+def bench_traffic_memory(records: int):
+    print(f"Traffic history memory, {records:,} records (peak RSS delta)")
+    start = time.perf_counter()
+    dict_bytes = _measure(_build_dicts, records)
+    print(f"  dict:          {dict_bytes:8.1f} bytes/record  ({dict_bytes * records / 2**20:,.0f} MiB)")
+    record_bytes = _measure(_build_records, records)
+    print(f"  TrafficRecord: {record_bytes:8.1f} bytes/record  ({record_bytes * records / 2**20:,.0f} MiB)")
+    print(f"  reduction:     {(1 - record_bytes / dict_bytes) * 100:8.1f} %")
+    print(f"  ({time.perf_counter() - start:.1f}s)")
+
+
+class _NullSocket:
+    """Stands in for a websocket; accepts and discards frames."""
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        pass
+
+
+async def _run_broadcast(rate: int, seconds: float, tick_ms: int, subscribers: int):
+    manager = ConnectionManager()
+    for _ in range(subscribers):
+        await manager.connect(_NullSocket(), tick_ms=tick_ms)
+    payloads = [TrafficRecord.from_wire(json.loads(p)) for p in _payload_pool()]
+    interval = 1 / rate
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for i in range(int(rate * seconds)):
+        await manager.broadcast(payloads[i % len(payloads)])
+        # Pace against the wall clock so ticks see a realistic arrival rate
+        delay = start + (i + 1) * interval - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    await asyncio.sleep(tick_ms / 1000 * 2)
+    stats = manager.stats()
+    for socket in manager.active_connections:
+        manager.disconnect(socket)
+    return stats
+
+
+def bench_broadcast_batching(rate: int, seconds: float, tick_ms: int, subscribers: int):
+    print(f"Dashboard fan-out, {rate} msg/s for {seconds:g}s to {subscribers} subscriber(s)")
+    for label, tick in (("immediate", 0), (f"batched {tick_ms}ms", tick_ms)):
+        stats = asyncio.run(_run_broadcast(rate, seconds, tick, subscribers))
+        mode = stats["batched" if tick else "immediate"]
+        fps = mode["frames"] / seconds / subscribers
+        print(f"  {label:14} {fps:8.1f} frames/s/subscriber  {mode['bytes'] / seconds / subscribers / 1024:8.1f} KiB/s/subscriber"
+              f"  (saved {mode['frames_saved']:,} frames, {mode['bytes_saved']:,} bytes)")
+
+
+async def _swarm_bytes(swarms: int, history: int, subscribed: bool) -> float:
+    """Retained bytes per swarm for a registry of `swarms` swarms."""
+    records = [TrafficRecord.from_wire(json.loads(p)) for p in _payload_pool()]
+    registry = SwarmRegistry(max_swarms=swarms)
+    gc.collect()
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    for i in range(swarms):
+        swarm = registry.get_or_create(f"swarm-{i}")
+        if subscribed:
+            await swarm.manager.connect(_NullSocket())
+        for j in range(history):
+            # Shared records, so only the swarm's own structures are counted
+            await swarm.manager.broadcast(records[j % len(records)])
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (current - base) / swarms
+
+
+def bench_swarm_overhead(swarms: int):
+    print(f"Per-swarm memory overhead, {swarms:,} swarms (tracemalloc, excluding message payloads)")
+    for label, history, subscribed in (
+        ("empty", 0, False),
+        ("1 subscriber", 0, True),
+        ("1 subscriber, full history", 100, True),
+    ):
+        per_swarm = asyncio.run(_swarm_bytes(swarms, history, subscribed))
+        print(f"  {label:28} {per_swarm:10,.0f} bytes/swarm")
+
+
+def _per_call_us(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def bench_token_counting(messages: int):
+    # Traffic-shaped strings: thoughts, JSON equivalents and wire formats,
+    # made unique per message so the per-string memo can't answer them
+    texts = []
+    for i in range(messages):
+        scenario = SCRIPT[i % len(SCRIPT)]
+        texts.append(f"{scenario['thought']} (step {i})")
+        texts.append(json.dumps(dict(scenario["json_equiv"], seq=i)))
+        texts.append(f"{ANCHORS[i % len(ANCHORS)]}(step:{i},target:auth)")
+
+    start = time.perf_counter()
+    counter = BPETokenCounter()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Token counting, {len(texts):,} strings")
+    print(f"  vocabulary load:            {load_ms:8.1f} ms ({len(counter.ranks):,} tokens)")
+    print(f"  old heuristic:              {_per_call_us(lambda t: len(t.split()) + len(t) // 4, texts):8.2f} us/string")
+    print(f"  pre-tokenizer regex only:   {_per_call_us(_PRETOKENIZE.findall, texts):8.2f} us/string")
+    no_cache = lambda t: sum(len(counter.encode_piece(p)) for p in _PRETOKENIZE.findall(t))
+    print(f"  bpe, no pre-token cache:    {_per_call_us(no_cache, texts[:3000]):8.2f} us/string")
+    print(f"  bpe, new strings:           {_per_call_us(counter.count, texts):8.2f} us/string")
+    print(f"  bpe, memoized:              {_per_call_us(counter.count, texts):8.2f} us/string")
+
+    unseen = [t + " again" for t in texts]
+    print(f"  bpe, new strings, warm:     {_per_call_us(counter.count, unseen):8.2f} us/string")
+    start = time.perf_counter()
+    for i in range(0, len(texts), 100):
+        counter.count_many(texts[i:i + 100])
+    print(f"  count_many (100/call):      {(time.perf_counter() - start) / len(texts) * 1e6:8.2f} us/string")
+
+
+def bench_token_accuracy():
+    counter = BPETokenCounter()
+    reference = sum(n for _, n in TOKEN_SAMPLES)
+    print(f"Token counts vs tiktoken cl100k_base, {len(TOKEN_SAMPLES)} samples ({reference:,} reference tokens)")
+    for name, count in (
+        ("old heuristic", lambda t: len(t.split()) + len(t) // 4),
+        ("cl100k_base", counter.count),
+    ):
+        counts = [count(text) for text, _ in TOKEN_SAMPLES]
+        total_err = (sum(counts) - reference) / reference * 100
+        mean_abs = sum(abs(c - n) / n for c, (_, n) in zip(counts, TOKEN_SAMPLES)) / len(TOKEN_SAMPLES) * 100
+        print(f"  {name + ':':16} total {sum(counts):6,} ({total_err:+6.1f}%), mean per-sample error {mean_abs:5.1f}%")
+
+
+async def _bench_snapshot(swarms: int, cache_entries: int, path: str):
+    records = [json.loads(p) for p in _payload_pool()]
+    registry = SwarmRegistry(max_swarms=swarms)
+    cache = QuantizationCache(max_entries=cache_entries)
+    for i in range(swarms):
+        swarm = registry.get_or_create(f"swarm-{i}")
+        for j in range(registry.history_limit):
+            await swarm.manager.broadcast(TrafficRecord.from_wire(records[(i + j) % len(records)]))
+        swarm.approve(f"Anchor{i}", "Swarm-specific anchor")
+        swarm.dismiss(f"Dismissed{i}")
+    for i in range(cache_entries):
+        scenario = SCRIPT[i % len(SCRIPT)]
+        key = QuantizationCache.key(f"{scenario['thought']} #{i}", scenario["src"], scenario["dst"], [])
+        cache.put(key, {
+            "anchor": "RequestTask", "reasoning": "The message requests execution of a task",
+            "params": {"task": "regression_test", "target": "auth"},
+            "wire": "RequestTask(test:regression,target:auth)",
+            "original_tokens": 12, "compressed_tokens": 9, "savings_pct": 25.0,
+        })
+
+    saver = SnapshotManager(path, registry, cache)
+    size = await saver.save()
+    restorer = SnapshotManager(path, SwarmRegistry(max_swarms=swarms), QuantizationCache(max_entries=cache_entries))
+    await restorer.load()
+    return size, saver.stats, restorer.stats, len(restorer.cache)
+
+
+def bench_snapshot(swarms: int, cache_entries: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.json.gz")
+        size, saved, restored, cached = asyncio.run(_bench_snapshot(swarms, cache_entries, path))
+    print(f"State snapshot, {swarms:,} swarms x 100 history, {cache_entries:,} cached quantizations")
+    print(f"  file size:           {size / 1024:10,.1f} KiB (gzip)")
+    print(f"  capture (on loop):   {saved['capture_ms']:10.2f} ms")
+    print(f"  write (thread):      {saved['write_ms']:10.2f} ms")
+    print(f"  restore read:        {restored['restore_read_ms']:10.2f} ms")
+    print(f"  restore apply:       {restored['restore_apply_ms']:10.2f} ms ({cached:,} cache entries)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("traffic-memory", help="Bytes per traffic record: dict vs TrafficRecord")
+    p.add_argument("--records", type=int, default=1_000_000)
+
+    p = sub.add_parser("broadcast-batching", help="Frames and bytes per subscriber: immediate vs tick batching")
+    p.add_argument("--rate", type=int, default=500, help="Messages per second")
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.add_argument("--tick-ms", type=int, default=100)
+    p.add_argument("--subscribers", type=int, default=10)
+
+    p = sub.add_parser("swarm-overhead", help="Memory per swarm namespace")
+    p.add_argument("--swarms", type=int, default=500)
+
+    p = sub.add_parser("token-counting", help="Per-string cost of BPE token counting")
+    p.add_argument("--messages", type=int, default=10_000)
+
+    sub.add_parser("token-accuracy", help="Token counts vs tiktoken's cl100k_base on fixed samples")
+
+    p = sub.add_parser("snapshot", help="State snapshot size, save and restore times")
+    p.add_argument("--swarms", type=int, default=200)
+    p.add_argument("--cache", type=int, default=10_000)
+
+    args = parser.parse_args()
+    if args.command == "traffic-memory":
+        bench_traffic_memory(args.records)
+    elif args.command == "broadcast-batching":
+        bench_broadcast_batching(args.rate, args.seconds, args.tick_ms, args.subscribers)
+    elif args.command == "swarm-overhead":
+        bench_swarm_overhead(args.swarms)
+    elif args.command == "token-counting":
+        bench_token_counting(args.messages)
+    elif args.command == "token-accuracy":
+        bench_token_accuracy()
+    elif args.command == "snapshot":
+        bench_snapshot(args.swarms, args.cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,18 +7,37 @@ into semantic anchors with compact wire formats.
 
 import os
 import json
+import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+from tokens import count_tokens_many
 
 logger = logging.getLogger("slipstream-gemini")
 
 # Gemini client - initialized lazily
 _gemini_model = None
+_gemini_lock = threading.Lock()
 
 def get_gemini_model():
-    """Lazily initialize and return the Gemini model."""
+    """
+    Lazily initialize and return the Gemini model.
+
+    Its async client is a grpc.aio channel bound to the first event loop that
+    uses it, so only call the model's async methods on the SyncQuantizer loop
+    (quantize_with_gemini and suggest_new_anchor route there).
+    """
     global _gemini_model
-    if _gemini_model is None:
+    if _gemini_model is not None:
+        return _gemini_model
+    with _gemini_lock:
+        if _gemini_model is not None:
+            return _gemini_model
         try:
             import google.generativeai as genai
 
@@ -133,6 +152,61 @@ Output:
 Now analyze and compress the input message:"""
 
 
+class QuantizationCache:
+    """
+    Bounded LRU of successful quantization results.
+
+    Shared by the hub loop and the SyncQuantizer thread, and persisted across
+    restarts by the state snapshots, so repeated messages skip Gemini.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(message: str, src: str, dst: str, anchors: List[Dict]) -> str:
+        # crc32 rather than hash() so keys stay valid across processes
+        registry = zlib.crc32("|".join(a["mnemonic"] for a in anchors).encode())
+        return f"{registry:08x}\x1f{src}\x1f{dst}\x1f{message}"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(result)
+
+    def put(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Snapshot of the entries, least recently used first."""
+        with self._lock:
+            return list(self._entries.items())
+
+    def load(self, items: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Bulk insert, e.g. when restoring a snapshot."""
+        for key, result in items:
+            self.put(key, result)
+
+
+quantization_cache = QuantizationCache(int(os.environ.get("SLIPSTREAM_QUANTIZATION_CACHE_SIZE", 10000)))
+
+
 async def quantize_with_gemini(
     message: str,
     src: str,
@@ -142,15 +216,33 @@ async def quantize_with_gemini(
     """
     Use Gemini to semantically quantize a message.
 
+    Awaitable from any event loop; the request itself runs on the shared
+    SyncQuantizer loop, which owns the Gemini client.
+
     Returns:
         Dict with keys: anchor, reasoning, params, wire, tokens_saved
         Or None if Gemini is unavailable
     """
+    return await asyncio.wrap_future(get_sync_quantizer().submit(message, src, dst, custom_anchors))
+
+
+async def _quantize_on_loop(
+    message: str,
+    src: str,
+    dst: str,
+    custom_anchors: Optional[List[Dict]] = None
+) -> Optional[Dict[str, Any]]:
+    """quantize_with_gemini body. Runs on the SyncQuantizer loop only."""
+    anchors = custom_anchors or ANCHOR_REGISTRY
+    cache_key = QuantizationCache.key(message, src, dst, anchors)
+    cached = quantization_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     model = get_gemini_model()
     if model is None:
         return None
 
-    anchors = custom_anchors or ANCHOR_REGISTRY
     prompt = build_quantization_prompt(message, src, dst, anchors)
 
     try:
@@ -166,9 +258,8 @@ async def quantize_with_gemini(
 
         result = json.loads(text)
 
-        # Calculate token savings estimate
-        original_tokens = len(message.split())
-        wire_tokens = len(result.get("wire", "").split())
+        # Calculate token savings
+        original_tokens, wire_tokens = count_tokens_many([message, result.get("wire", "")])
 
         result["original_tokens"] = original_tokens
         result["compressed_tokens"] = wire_tokens
@@ -176,7 +267,8 @@ async def quantize_with_gemini(
 
         logger.info(f"Gemini quantized: '{message[:50]}...' -> {result['anchor']} ({result['savings_pct']}% reduction)")
 
-        return result
+        quantization_cache.put(cache_key, result)
+        return dict(result)
 
     except json.JSONDecodeError as e:
         logger.error(f"Gemini returned invalid JSON: {e}")
@@ -192,8 +284,15 @@ async def suggest_new_anchor(
 ) -> Optional[Dict[str, Any]]:
     """
     Use Gemini to suggest a new anchor when existing ones don't fit well.
-    This powers the "Autotuner" feature.
+    This powers the "Autotuner" feature. Runs on the SyncQuantizer loop.
     """
+    return await asyncio.wrap_future(
+        get_sync_quantizer().run_coroutine(_suggest_on_loop(message, existing_anchors))
+    )
+
+
+async def _suggest_on_loop(message: str, existing_anchors: List[Dict]) -> Optional[Dict[str, Any]]:
+    """suggest_new_anchor body. Runs on the SyncQuantizer loop only."""
     model = get_gemini_model()
     if model is None:
         return None
@@ -240,16 +339,204 @@ The anchor should be:
         return None
 
 
-# Synchronous wrapper for non-async contexts
-def quantize_sync(message: str, src: str, dst: str) -> Optional[Dict[str, Any]]:
-    """Synchronous version of quantize_with_gemini for compatibility."""
-    import asyncio
+# --- Synchronous API for non-async contexts ---
+
+class SyncQuantizer:
+    """
+    The one event loop, in a daemon thread, that runs every Gemini request
+    in the process.
+
+    Sync callers (agent frameworks running in worker threads) submit work and
+    get concurrent.futures.Future objects back; async callers go through
+    quantize_with_gemini, which awaits the same futures. Every request runs
+    on this loop, so the Gemini model and its loop-bound grpc.aio client are
+    created once and reused.
+    """
+
+    def __init__(self, max_concurrency: int = 16, name: str = "slipstream-quantizer"):
+        self.max_concurrency = max_concurrency
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the background loop thread (idempotent)."""
+        with self._lock:
+            if self.running:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(loop, ready), name=self.name, daemon=True
+            )
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+
+    def _run(self, loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        # Created inside the loop thread so it binds to this loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the loop thread. Pending requests are cancelled."""
+        with self._lock:
+            if not self.running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._loop = None
+            self._thread = None
+
+    async def _quantize(self, message: str, src: str, dst: str,
+                        custom_anchors: Optional[List[Dict]]) -> Optional[Dict[str, Any]]:
+        async with self._semaphore:
+            return await _quantize_on_loop(message, src, dst, custom_anchors)
+
+    def submit(
+        self,
+        message: str,
+        src: str,
+        dst: str,
+        custom_anchors: Optional[List[Dict]] = None
+    ) -> Future:
+        """Schedule one message for quantization and return a Future for its result."""
+        return self.run_coroutine(self._quantize(message, src, dst, custom_anchors))
+
+    def run_coroutine(self, coro) -> Future:
+        """Run a coroutine on the quantizer loop and return a Future for its result."""
+        self.start()
+        # Read the loop under the lock so a concurrent stop() can't swap it for None mid-call
+        with self._lock:
+            loop, thread = self._loop, self._thread
+        if loop is None:
+            raise RuntimeError("SyncQuantizer was stopped")
+        if threading.current_thread() is thread:
+            coro.close()
+            raise RuntimeError("SyncQuantizer cannot be called from its own loop thread")
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def submit_batch(
+        self,
+        messages: Iterable[Tuple[str, str, str]],
+        custom_anchors: Optional[List[Dict]] = None
+    ) -> List[Future]:
+        """
+        Schedule many (message, src, dst) tuples at once.
+
+        Returns one Future per message, in input order. Requests run
+        concurrently on the loop, bounded by max_concurrency.
+        """
+        return [self.submit(message, src, dst, custom_anchors) for message, src, dst in messages]
+
+    def quantize(
+        self,
+        message: str,
+        src: str,
+        dst: str,
+        custom_anchors: Optional[List[Dict]] = None,
+        timeout: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Blocking quantization of a single message.
+
+        Raises:
+            RuntimeError: if called on a thread running an event loop, which
+                would stall that loop for a Gemini round-trip; await
+                quantize_with_gemini() there instead
+        """
+        _check_blocking_allowed()
+        future = self.submit(message, src, dst, custom_anchors)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # Cancel the abandoned request so it releases its concurrency slot
+            future.cancel()
+            raise
+
+    def quantize_batch(
+        self,
+        messages: Iterable[Tuple[str, str, str]],
+        custom_anchors: Optional[List[Dict]] = None,
+        timeout: Optional[float] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Blocking quantization of many messages. Results are in input order. Raises like quantize()."""
+        _check_blocking_allowed()
+        futures = self.submit_batch(messages, custom_anchors)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            return [
+                f.result(None if deadline is None else max(0.0, deadline - time.monotonic()))
+                for f in futures
+            ]
+        except FutureTimeoutError:
+            for f in futures:
+                f.cancel()
+            raise
+
+
+def _check_blocking_allowed():
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # We're in an async context, can't use run_until_complete
-            return None
-        return loop.run_until_complete(quantize_with_gemini(message, src, dst))
+        asyncio.get_running_loop()
     except RuntimeError:
-        # No event loop, create one
-        return asyncio.run(quantize_with_gemini(message, src, dst))
+        return
+    raise RuntimeError(
+        "Blocking quantization called from a running event loop; "
+        "use 'await quantize_with_gemini(...)' instead"
+    )
+
+
+_sync_quantizer: Optional[SyncQuantizer] = None
+_sync_quantizer_lock = threading.Lock()
+
+def get_sync_quantizer() -> SyncQuantizer:
+    """Return the process-wide SyncQuantizer, starting its loop thread on first use."""
+    global _sync_quantizer
+    with _sync_quantizer_lock:
+        if _sync_quantizer is None:
+            _sync_quantizer = SyncQuantizer()
+    _sync_quantizer.start()
+    return _sync_quantizer
+
+
+def quantize_sync(
+    message: str,
+    src: str,
+    dst: str,
+    custom_anchors: Optional[List[Dict]] = None,
+    timeout: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Synchronous version of quantize_with_gemini.
+
+    Call from threads without a running event loop; blocks until the result
+    is ready or `timeout` expires. From async code, await
+    quantize_with_gemini() instead (this raises RuntimeError there).
+    """
+    return get_sync_quantizer().quantize(message, src, dst, custom_anchors, timeout)
+
+
+def quantize_batch_sync(
+    messages: Iterable[Tuple[str, str, str]],
+    custom_anchors: Optional[List[Dict]] = None,
+    timeout: Optional[float] = None
+) -> List[Optional[Dict[str, Any]]]:
+    """Synchronous batch quantization of (message, src, dst) tuples."""
+    return get_sync_quantizer().quantize_batch(messages, custom_anchors, timeout)
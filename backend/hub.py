@@ -0,0 +1,449 @@
+"""
+Websocket fan-out for the Slipstream Control Plane.
+
+Each connected client is a Subscriber. Agents receive every frame as soon as
+it is broadcast. Dashboards can opt in to tick-based coalescing: everything
+broadcast within one tick is delivered as a single `batch` frame, which keeps
+the browser from re-rendering once per message under heavy traffic.
+
+One process can host many independent swarms. Each Swarm has its own
+ConnectionManager (subscribers and history), anchor approvals/dismissals and
+registry overlay; the SwarmRegistry caps how many exist and evicts idle ones.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Set, Union
+
+from traffic import TrafficRecord, to_wire
+
+if TYPE_CHECKING:
+    from fastapi import WebSocket
+
+logger = logging.getLogger("slipstream-control-plane")
+
+# Allowed range for ?tick_ms= on the hub endpoint
+MIN_TICK_MS = 10
+MAX_TICK_MS = 5000
+# Messages a batched subscriber may hold between ticks; the oldest are dropped
+# beyond this, so a slow or stalled dashboard can't grow the hub without bound
+MAX_BUFFERED_MESSAGES = 1000
+
+DEFAULT_SWARM = "default"
+_SWARM_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _frame_overhead(size: int) -> int:
+    """Websocket header bytes for an unmasked server-to-client text frame."""
+    if size <= 125:
+        return 2
+    if size <= 65535:
+        return 4
+    return 10
+
+
+def encode(message: Dict[str, Any]) -> str:
+    """Serialize a wire message once, for every subscriber. Raises on NaN/Infinity, which browsers can't parse."""
+    return json.dumps(message, separators=(",", ":"), allow_nan=False)
+
+
+class Subscriber:
+    """A connected websocket plus its delivery mode and counters."""
+
+    __slots__ = (
+        "websocket", "tick", "buffer", "task",
+        "messages", "frames", "bytes", "unbatched_frames", "unbatched_bytes", "dropped",
+    )
+
+    def __init__(self, websocket: WebSocket, tick_ms: int = 0):
+        self.websocket = websocket
+        # Seconds between batch flushes, or 0 for immediate delivery
+        self.tick = tick_ms / 1000
+        self.buffer: deque = deque(maxlen=MAX_BUFFERED_MESSAGES)
+        self.task: Optional[asyncio.Task] = None
+        # Delivery counters - `unbatched_*` is what immediate delivery of the
+        # same (not dropped) messages would have cost
+        self.messages = 0
+        self.frames = 0
+        self.bytes = 0
+        self.unbatched_frames = 0
+        self.unbatched_bytes = 0
+        # Messages pushed out of a full buffer before they were sent
+        self.dropped = 0
+
+    @property
+    def batched(self) -> bool:
+        return self.tick > 0
+
+    async def send(self, text: str):
+        await self.websocket.send_text(text)
+        self.frames += 1
+        self.bytes += len(text) + _frame_overhead(len(text))
+
+    async def deliver(self, text: str):
+        """Send now, or queue for the next tick if this subscriber is batched."""
+        self.messages += 1
+        self.unbatched_frames += 1
+        self.unbatched_bytes += len(text) + _frame_overhead(len(text))
+        if self.batched:
+            if len(self.buffer) == self.buffer.maxlen:
+                # The deque drops the oldest message; it was never sent, so it saves nothing
+                oldest = self.buffer[0]
+                self.dropped += 1
+                self.unbatched_frames -= 1
+                self.unbatched_bytes -= len(oldest) + _frame_overhead(len(oldest))
+            self.buffer.append(text)
+        else:
+            await self.send(text)
+
+    async def flush(self):
+        """Send everything buffered since the last tick as one frame."""
+        if not self.buffer:
+            return
+        buffered, self.buffer = self.buffer, deque(maxlen=MAX_BUFFERED_MESSAGES)
+        if len(buffered) == 1:
+            await self.send(buffered[0])
+        else:
+            await self.send('{"type":"batch","messages":[' + ",".join(buffered) + "]}")
+
+    async def run(self):
+        """Flush loop for batched subscribers, one per subscriber."""
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing batch: {e}")
+
+
+class ConnectionManager:
+    def __init__(self, history_limit: int = 100):
+        self.subscribers: Dict[WebSocket, Subscriber] = {}
+        # Store for "Dual View" - traffic is kept as compact TrafficRecords,
+        # everything else (proposals, notifications) as plain dicts
+        self.message_history: deque = deque(maxlen=history_limit)
+        # Counters of subscribers that have already disconnected
+        self._retired = {"immediate": [0, 0, 0, 0, 0, 0], "batched": [0, 0, 0, 0, 0, 0]}
+        # Monotonic time of the last lookup, connect, disconnect or broadcast
+        self.last_active = time.monotonic()
+        # Connections accepted but not yet registered as subscribers
+        self.pending = 0
+        # Running totals over all traffic ever broadcast, not just history
+        self.traffic_totals = {"messages": 0, "fallbacks": 0, "json_tokens": 0, "slip_tokens": 0}
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.subscribers)
+
+    async def connect(self, websocket: WebSocket, tick_ms: int = 0):
+        """
+        Accept a client. A positive tick_ms opts it in to batched delivery;
+        it is clamped to [MIN_TICK_MS, MAX_TICK_MS]. Zero or negative means
+        immediate delivery.
+        """
+        # Counted from before the accept() await, so the swarm isn't evicted
+        # while this client is still being set up
+        self.pending += 1
+        try:
+            await websocket.accept()
+        finally:
+            self.pending -= 1
+        if tick_ms > 0:
+            tick_ms = min(max(tick_ms, MIN_TICK_MS), MAX_TICK_MS)
+        else:
+            tick_ms = 0
+        subscriber = Subscriber(websocket, tick_ms)
+        if subscriber.batched:
+            subscriber.task = asyncio.create_task(subscriber.run())
+        self.subscribers[websocket] = subscriber
+        self.last_active = time.monotonic()
+        logger.info(f"New client connected ({f'batched, {tick_ms}ms tick' if tick_ms else 'immediate'})")
+
+    def disconnect(self, websocket: WebSocket):
+        subscriber = self.subscribers.pop(websocket, None)
+        if subscriber is None:
+            return
+        self.last_active = time.monotonic()
+        if subscriber.task:
+            subscriber.task.cancel()
+        totals = self._retired["batched" if subscriber.batched else "immediate"]
+        for i, value in enumerate(self._counters(subscriber)):
+            totals[i] += value
+        logger.info("Client disconnected")
+
+    def history_wire(self) -> List[Dict[str, Any]]:
+        """History in wire format, for syncing newly connected clients."""
+        return [to_wire(m) for m in self.message_history]
+
+    async def broadcast(self, message: Union[TrafficRecord, Dict[str, Any]]):
+        """Broadcasts a message to all connected clients."""
+        # Serialize once, not once per connection. This also validates the
+        # message, so a malformed one raises before any state is touched.
+        text = encode(to_wire(message))
+        if isinstance(message, TrafficRecord):
+            totals = self.traffic_totals
+            # Sum first: non-numeric metrics raise here, not halfway through the update
+            json_tokens = totals["json_tokens"] + message.json_tokens
+            slip_tokens = totals["slip_tokens"] + message.slip_tokens
+            totals["messages"] += 1
+            totals["json_tokens"] = json_tokens
+            totals["slip_tokens"] = slip_tokens
+            if message.anchor == "NONE":
+                totals["fallbacks"] += 1
+            # A trace describes one delivery; the caller keeps its own reference
+            # for fan-out timing and export, history doesn't need it
+            message.trace = None
+
+        # Bounded by the deque's maxlen
+        self.message_history.append(message)
+        self.last_active = time.monotonic()
+        for subscriber in list(self.subscribers.values()):
+            try:
+                await subscriber.deliver(text)
+            except Exception as e:
+                logger.error(f"Error broadcasting: {e}")
+
+    @staticmethod
+    def _counters(subscriber: Subscriber) -> List[int]:
+        return [
+            subscriber.messages, subscriber.frames, subscriber.bytes,
+            subscriber.unbatched_frames, subscriber.unbatched_bytes, subscriber.dropped,
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Delivery counters per mode, including frames and bytes saved by batching."""
+        result = {}
+        for mode in ("immediate", "batched"):
+            totals = list(self._retired[mode])
+            connected = 0
+            for subscriber in self.subscribers.values():
+                if subscriber.batched == (mode == "batched"):
+                    connected += 1
+                    for i, value in enumerate(self._counters(subscriber)):
+                        totals[i] += value
+            messages, frames, sent_bytes, unbatched_frames, unbatched_bytes, dropped = totals
+            result[mode] = {
+                "subscribers": connected,
+                "messages": messages,
+                "frames": frames,
+                "bytes": sent_bytes,
+                "frames_saved": unbatched_frames - frames,
+                "bytes_saved": unbatched_bytes - sent_bytes,
+                "dropped": dropped,
+            }
+        return result
+
+
+def _with_overlay(base: List[Dict[str, Any]], overlay: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Anchor registry `base` plus overlay entries it doesn't already define."""
+    if not overlay:
+        return base
+    known = {a["mnemonic"] for a in base}
+    return base + [{"mnemonic": m, "definition": d} for m, d in overlay.items() if m not in known]
+
+
+class Swarm:
+    """An isolated namespace: its own stream, history and anchor decisions."""
+
+    __slots__ = ("name", "manager", "approved_anchors", "dismissed_anchors", "registry_overlay", "max_anchors")
+
+    def __init__(self, name: str, history_limit: int = 100, max_anchors: int = 256):
+        self.name = name
+        self.manager = ConnectionManager(history_limit=history_limit)
+        self.approved_anchors: Set[str] = set()
+        self.dismissed_anchors: Set[str] = set()  # Anchors the user has explicitly dismissed
+        # Approved anchors added on top of the base registry: mnemonic -> definition
+        self.registry_overlay: Dict[str, str] = {}
+        # Cap on approvals, dismissals and overlay entries each
+        self.max_anchors = max_anchors
+
+    def approve(self, mnemonic: str, definition: Optional[str] = None) -> bool:
+        """Approve an anchor and add it to the overlay. Returns False if the swarm is at its cap."""
+        if mnemonic not in self.approved_anchors and len(self.approved_anchors) >= self.max_anchors:
+            return False
+        if definition is None:
+            definition = self._proposed_definition(mnemonic)
+        self.approved_anchors.add(mnemonic)
+        self.dismissed_anchors.discard(mnemonic)
+        self.registry_overlay[mnemonic] = definition or "User-approved anchor"
+        return True
+
+    def dismiss(self, mnemonic: str) -> bool:
+        """Dismiss an anchor so it is no longer proposed. Returns False if the swarm is at its cap."""
+        if mnemonic not in self.dismissed_anchors and len(self.dismissed_anchors) >= self.max_anchors:
+            return False
+        self.dismissed_anchors.add(mnemonic)
+        return True
+
+    def _proposed_definition(self, mnemonic: str) -> Optional[str]:
+        """Definition from the most recent proposal for this mnemonic still in history."""
+        for message in reversed(self.manager.message_history):
+            if isinstance(message, dict) and message.get("type") == "proposal" and message.get("mnemonic") == mnemonic:
+                return message.get("definition")
+        return None
+
+    def anchors(self, base: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The base registry plus this swarm's overlay."""
+        return _with_overlay(base, self.registry_overlay)
+
+    def has_durable_state(self) -> bool:
+        """True if the swarm holds anchor decisions that must outlive eviction."""
+        return bool(self.approved_anchors or self.dismissed_anchors or self.registry_overlay)
+
+    def durable_state(self) -> Dict[str, Any]:
+        """Anchor decisions and traffic totals: what survives eviction and restarts."""
+        return {
+            "approved_anchors": list(self.approved_anchors),
+            "dismissed_anchors": list(self.dismissed_anchors),
+            "registry_overlay": dict(self.registry_overlay),
+            "traffic_totals": dict(self.manager.traffic_totals),
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """Merge in state produced by durable_state(), up to max_anchors entries each."""
+        approved = list(state.get("approved_anchors", []))
+        dismissed = list(state.get("dismissed_anchors", []))
+        overlay = dict(state.get("registry_overlay", {}))
+        for mnemonic in approved:
+            if mnemonic not in self.approved_anchors and len(self.approved_anchors) >= self.max_anchors:
+                break
+            self.approved_anchors.add(mnemonic)
+        for mnemonic in dismissed:
+            if mnemonic not in self.dismissed_anchors and len(self.dismissed_anchors) >= self.max_anchors:
+                break
+            self.dismissed_anchors.add(mnemonic)
+        for mnemonic, definition in overlay.items():
+            if mnemonic not in self.registry_overlay and len(self.registry_overlay) >= self.max_anchors:
+                break
+            self.registry_overlay[mnemonic] = definition
+        dropped = (
+            len(set(approved) - self.approved_anchors)
+            + len(set(dismissed) - self.dismissed_anchors)
+            + len(overlay.keys() - self.registry_overlay.keys())
+        )
+        if dropped:
+            logger.warning(f"Swarm {self.name!r}: dropped {dropped} restored anchor entries over the cap of {self.max_anchors}")
+        self.manager.traffic_totals.update(state.get("traffic_totals", {}))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "subscribers": len(self.manager.subscribers),
+            "history": len(self.manager.message_history),
+            "approved_anchors": len(self.approved_anchors),
+            "dismissed_anchors": len(self.dismissed_anchors),
+            "traffic": dict(self.manager.traffic_totals),
+            "idle_seconds": round(time.monotonic() - self.manager.last_active, 1),
+        }
+
+
+class SwarmRegistry:
+    """
+    All swarms hosted by this process.
+
+    Swarms are created on first connect and evicted once they have had no
+    subscribers for idle_ttl seconds. The default swarm is never evicted.
+
+    Eviction frees a swarm's subscribers and history. If it has anchor
+    decisions, those and its traffic totals are kept in `dormant` (at most
+    max_swarms entries) and restored when the swarm is next used, so
+    approvals survive both eviction and snapshots.
+    """
+
+    def __init__(
+        self,
+        max_swarms: int = 1000,
+        history_limit: int = 100,
+        max_anchors: int = 256,
+        idle_ttl: float = 600,
+    ):
+        self.max_swarms = max_swarms
+        self.history_limit = history_limit
+        self.max_anchors = max_anchors
+        self.idle_ttl = idle_ttl
+        self.swarms: Dict[str, Swarm] = {}
+        # Durable state of evicted swarms, oldest first: name -> Swarm.durable_state()
+        self.dormant: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.swarms)
+
+    def get(self, name: str) -> Optional[Swarm]:
+        return self.swarms.get(name)
+
+    def anchors(self, name: str, base: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The base registry plus the named swarm's overlay, whether it is active or dormant."""
+        swarm = self.swarms.get(name)
+        if swarm is not None:
+            return swarm.anchors(base)
+        state = self.dormant.get(name)
+        return _with_overlay(base, state["registry_overlay"]) if state else base
+
+    def get_or_create(self, name: str) -> Swarm:
+        """
+        Return the named swarm, creating it if needed.
+
+        Raises:
+            ValueError: name is not 1-64 characters of [A-Za-z0-9_-]
+            RuntimeError: max_swarms reached and no idle swarm could be evicted
+        """
+        swarm = self.swarms.get(name)
+        if swarm is not None:
+            swarm.manager.last_active = time.monotonic()
+            return swarm
+        if not _SWARM_NAME.match(name):
+            raise ValueError(f"Invalid swarm name: {name!r}")
+        if len(self.swarms) >= self.max_swarms and not self.evict_idle(force=True):
+            raise RuntimeError(f"Swarm limit reached ({self.max_swarms})")
+        swarm = self.swarms[name] = Swarm(name, self.history_limit, self.max_anchors)
+        state = self.dormant.pop(name, None)
+        if state is not None:
+            swarm.restore_state(state)
+            logger.info(f"Swarm revived: {name} ({len(self.swarms)} active)")
+        else:
+            logger.info(f"Swarm created: {name} ({len(self.swarms)} active)")
+        return swarm
+
+    def evict_idle(self, force: bool = False) -> List[str]:
+        """
+        Drop swarms without subscribers that have been idle for idle_ttl,
+        keeping their anchor decisions in `dormant`.
+
+        With force=True, only the least recently active idle swarm is dropped,
+        whatever its age - used to make room when the registry is full.
+        """
+        now = time.monotonic()
+        idle = [
+            swarm for name, swarm in self.swarms.items()
+            if name != DEFAULT_SWARM and not swarm.manager.subscribers and not swarm.manager.pending
+        ]
+        if force:
+            idle = sorted(idle, key=lambda swarm: swarm.manager.last_active)[:1]
+        else:
+            idle = [swarm for swarm in idle if now - swarm.manager.last_active >= self.idle_ttl]
+        for swarm in idle:
+            del self.swarms[swarm.name]
+            if swarm.has_durable_state():
+                self.dormant[swarm.name] = swarm.durable_state()
+        while len(self.dormant) > self.max_swarms:
+            name = next(iter(self.dormant))
+            del self.dormant[name]
+            logger.warning(f"Dropped anchor decisions of long-evicted swarm {name} (dormant limit {self.max_swarms})")
+        if idle:
+            logger.info(f"Evicted {len(idle)} idle swarm(s), {len(self.swarms)} active")
+        return [swarm.name for swarm in idle]
+
+    async def run_janitor(self, interval: float = 60):
+        """Background task evicting idle swarms."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.error(f"Error evicting swarms: {e}")
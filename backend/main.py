@@ -5,6 +5,7 @@ import json
 import logging
 import asyncio
 import random
+import time
 import os
 
 # Try to import slipcore as fallback, but prefer Gemini
@@ -17,16 +18,17 @@ except ImportError:
     logger_init.warning("slipcore not available - using Gemini-only mode")
 
 from script_data import SCRIPT
-from gemini_quantizer import quantize_with_gemini, suggest_new_anchor, ANCHOR_REGISTRY
+from gemini_quantizer import quantize_with_gemini, suggest_new_anchor, ANCHOR_REGISTRY, quantization_cache
+from traffic import TrafficRecord
+from hub import SwarmRegistry, DEFAULT_SWARM
+from tracing import TraceContext, new_message_id, exporter_from_env
+from tokens import count_tokens_many
+from snapshot import SnapshotManager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("slipstream-control-plane")
 
-# State for Simulation Interactivity
-APPROVED_ANCHORS = set()
-DISMISSED_ANCHORS = set()  # Anchors the user has explicitly dismissed
-
 # Real UCR anchors from slipcore (fallback if slipcore fails to load on Railway)
 FALLBACK_ANCHORS = [
     # Observations
@@ -98,43 +100,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        # Store for "Dual View" - mapping message IDs to both formats
-        self.message_history: List[Dict[str, Any]] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info("New client connected")
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        logger.info("Client disconnected")
-
-    async def broadcast(self, message: Dict[str, Any]):
-        """Broadcasts a message to all connected clients."""
-        self.message_history.append(message)
-        # Keep history manageable
-        if len(self.message_history) > 100:
-            self.message_history.pop(0)
-
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting: {e}")
+# Every swarm gets isolated history, routing and anchor approvals.
+# /ws/hub is the default swarm, which also carries the simulation.
+swarms = SwarmRegistry(
+    max_swarms=int(os.environ.get("SLIPSTREAM_MAX_SWARMS", 1000)),
+    history_limit=int(os.environ.get("SLIPSTREAM_HISTORY_LIMIT", 100)),
+    max_anchors=int(os.environ.get("SLIPSTREAM_SWARM_MAX_ANCHORS", 256)),
+    idle_ttl=float(os.environ.get("SLIPSTREAM_SWARM_IDLE_TTL", 600)),
+)
+default_swarm = swarms.get_or_create(DEFAULT_SWARM)
+
+# Durable state is snapshotted to $SLIPSTREAM_SNAPSHOT_PATH for warm restarts (empty disables)
+snapshot_path = os.environ.get("SLIPSTREAM_SNAPSHOT_PATH", "slipstream_state.json.gz")
+snapshots = SnapshotManager(
+    snapshot_path, swarms, quantization_cache,
+    interval=float(os.environ.get("SLIPSTREAM_SNAPSHOT_INTERVAL", 30)),
+) if snapshot_path else None
 
-manager = ConnectionManager()
+# Sampled traces go to $SLIPSTREAM_TRACE_FILE (Chrome Trace Event format) when set
+HUB_PROCESS = "hub"
+trace_exporter = exporter_from_env()
+
+def finish_trace(trace: TraceContext, message_id: str, fanout_start_ns: int):
+    """Record the fan-out span of a broadcast message and export the trace."""
+    trace.add_span("hub.fanout", HUB_PROCESS, fanout_start_ns, time.perf_counter_ns())
+    if trace_exporter:
+        trace_exporter.export(trace, message_id)
 
 @app.get("/")
 async def root():
     return {"status": "Slipstream Control Plane Active", "version": "1.0.0"}
 
-@app.get("/anchors")
-async def get_anchors():
-    """Returns the full Universal Concept Registry (UCR)."""
+def base_anchors() -> List[Dict[str, Any]]:
+    """The Universal Concept Registry (UCR), or FALLBACK_ANCHORS if unavailable."""
     try:
         ucr = get_default_ucr()
         anchors = [
@@ -151,18 +149,70 @@ async def get_anchors():
         # Return fallback anchors instead of empty
         return FALLBACK_ANCHORS
 
+@app.get("/anchors")
+async def get_anchors(swarm: str = DEFAULT_SWARM):
+    """Returns the full Universal Concept Registry (UCR) plus the swarm's approved anchors."""
+    return swarms.anchors(swarm, base_anchors())
+
+@app.get("/swarms")
+async def list_swarms():
+    """Active swarms and their sizes."""
+    return [namespace.stats() for namespace in swarms.swarms.values()]
+
+@app.get("/stats/broadcast")
+async def broadcast_stats(swarm: str = DEFAULT_SWARM):
+    """Frames and bytes delivered per subscriber mode, and what batching saved."""
+    namespace = swarms.get(swarm)
+    return namespace.manager.stats() if namespace else {}
+
+@app.get("/stats/snapshot")
+async def snapshot_stats():
+    """Size and timings of the last state snapshot and restore."""
+    stats = dict(snapshots.stats) if snapshots else {"enabled": False}
+    stats["quantization_cache"] = {
+        "entries": len(quantization_cache),
+        "hits": quantization_cache.hits,
+        "misses": quantization_cache.misses,
+    }
+    return stats
+
 @app.websocket("/ws/hub")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    await hub_session(websocket, DEFAULT_SWARM)
+
+@app.websocket("/ws/hub/{swarm}")
+async def swarm_websocket_endpoint(websocket: WebSocket, swarm: str):
+    await hub_session(websocket, swarm)
+
+async def hub_session(websocket: WebSocket, swarm_name: str):
+    """Serve one websocket client within a swarm."""
+    try:
+        swarm = swarms.get_or_create(swarm_name)
+    except (ValueError, RuntimeError) as e:
+        logger.warning(f"Rejected connection to swarm {swarm_name!r}: {e}")
+        await websocket.close(code=1008)
+        return
+    manager = swarm.manager
+
+    # Dashboards pass ?tick_ms=100 to receive one `batch` frame per tick;
+    # agents omit it and get every message immediately
+    try:
+        tick_ms = int(websocket.query_params.get("tick_ms", 0))
+    except ValueError:
+        tick_ms = 0
+    # No await between get_or_create() and connect(): connect() marks the
+    # connection pending before accepting, which keeps the swarm from eviction
+    await manager.connect(websocket, tick_ms=tick_ms)
     try:
         # Send initial history
         await websocket.send_json({
             "type": "history_sync",
-            "messages": manager.message_history
+            "messages": manager.history_wire()
         })
         
         while True:
             data = await websocket.receive_text()
+            received_ns = time.perf_counter_ns()
             # In a real scenario, agents would send messages here.
             # For the control plane, we might receive control commands or
             # relay messages from one agent to another.
@@ -170,31 +220,53 @@ async def websocket_endpoint(websocket: WebSocket):
             # For now, just echo/broadcast what we receive
             try:
                 parsed = json.loads(data)
-                
+                parsed_ns = time.perf_counter_ns()
+
                 # Handle Anchor Approval
                 if parsed.get("type") == "approve_anchor":
                     mnemonic = parsed.get("mnemonic")
-                    if mnemonic:
-                        logger.info(f"Anchor approved: {mnemonic}")
-                        APPROVED_ANCHORS.add(mnemonic)
+                    if mnemonic and swarm.approve(mnemonic, parsed.get("definition")):
+                        logger.info(f"Anchor approved in {swarm.name}: {mnemonic}")
                         # Broadcast toast trigger back to all clients
                         await manager.broadcast({
                             "type": "system_notification",
                             "message": f"Anchor '{mnemonic}' optimized and deployed."
                         })
+                    elif mnemonic:
+                        logger.warning(f"Anchor limit reached in {swarm.name}, not approving {mnemonic}")
                 
                 # Handle Anchor Dismissal
                 if parsed.get("type") == "dismiss_anchor":
                     mnemonic = parsed.get("mnemonic")
-                    if mnemonic:
-                        logger.info(f"Anchor dismissed: {mnemonic}")
-                        DISMISSED_ANCHORS.add(mnemonic)
-                
+                    if mnemonic and swarm.dismiss(mnemonic):
+                        logger.info(f"Anchor dismissed in {swarm.name}: {mnemonic}")
+
+                # Store relayed agent traffic compactly
+                trace = None
+                if parsed.get("type") == "traffic":
+                    parsed = TrafficRecord.from_wire(parsed)
+                    trace = parsed.trace
+
+                if trace is not None:
+                    trace.mark("hub.receive", HUB_PROCESS, received_ns)
+                    trace.add_span("hub.parse", HUB_PROCESS, received_ns, parsed_ns)
+                    trace.add_span("hub.route", HUB_PROCESS, parsed_ns, time.perf_counter_ns())
+                    trace.mark("hub.broadcast", HUB_PROCESS)
+
+                fanout_start = time.perf_counter_ns()
                 await manager.broadcast(parsed)
+                if trace is not None:
+                    finish_trace(trace, parsed.id, fanout_start)
             except json.JSONDecodeError:
                 pass
+            except (TypeError, ValueError, AttributeError) as e:
+                # Drop the malformed frame, keep the connection
+                logger.warning(f"Dropping malformed frame in {swarm.name}: {e!r}")
                 
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Always unregister, or the swarm would never count as idle
         manager.disconnect(websocket)
 
 # --- Simulation Logic ---
@@ -207,6 +279,8 @@ async def generate_traffic():
     """
 
     script_index = 0
+    swarm = default_swarm
+    manager = swarm.manager
     use_gemini = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
 
     if use_gemini:
@@ -219,11 +293,11 @@ async def generate_traffic():
         thought = scenario["thought"]
         src = scenario["src"]
         dst = scenario["dst"]
+        trace = TraceContext()
 
         # Default values
         anchor_name = "Fallback"
         slip_wire = thought
-        slip_tokens = len(thought.split())
         gemini_reasoning = None
 
         # Check if this is a pre-marked fallback scenario
@@ -232,21 +306,21 @@ async def generate_traffic():
         # INTERACTIVITY: If this "fallback" anchor has been approved by the user,
         # flip it to a SUCCESS scenario dynamically!
         proposed = scenario.get("proposed_anchor")
-        if is_fallback and proposed and proposed["mnemonic"] in APPROVED_ANCHORS:
+        if is_fallback and proposed and proposed["mnemonic"] in swarm.approved_anchors:
             is_fallback = False
             anchor_name = proposed["mnemonic"]
             slip_wire = f"{anchor_name}(approved:true)"
-            slip_tokens = 2
             gemini_reasoning = f"User-approved anchor for this pattern"
 
         # Try Gemini quantization for non-fallback scenarios
         elif use_gemini and not is_fallback:
             try:
-                result = await quantize_with_gemini(thought, src, dst)
+                with trace.span("hub.quantize.gemini", HUB_PROCESS):
+                    # Anchors approved in this swarm become quantization targets too
+                    result = await quantize_with_gemini(thought, src, dst, swarm.anchors(ANCHOR_REGISTRY))
                 if result:
                     anchor_name = result.get("anchor", "Fallback")
                     slip_wire = result.get("wire", thought)
-                    slip_tokens = result.get("compressed_tokens", len(thought.split()))
                     gemini_reasoning = result.get("reasoning", "")
                     logger.info(f"Gemini: {thought[:40]}... -> {anchor_name}")
                 else:
@@ -260,10 +334,10 @@ async def generate_traffic():
         if is_fallback or (not use_gemini and not is_fallback):
             if SLIPCORE_AVAILABLE and not is_fallback:
                 try:
-                    slip_wire = think_quantize_transmit(thought, src=src, dst=dst)
-                    decoded = decode(slip_wire)
+                    with trace.span("hub.quantize.slipcore", HUB_PROCESS):
+                        slip_wire = think_quantize_transmit(thought, src=src, dst=dst)
+                        decoded = decode(slip_wire)
                     anchor_name = decoded.anchor.mnemonic
-                    slip_tokens = len(slip_wire.split())
                 except Exception as e:
                     logger.error(f"Slipcore error: {e}")
                     is_fallback = True
@@ -271,7 +345,8 @@ async def generate_traffic():
             if is_fallback:
                 slip_wire = f"[FALLBACK] {thought}"
                 anchor_name = "NONE"
-                slip_tokens = len(thought.split())
+
+        build_start = time.perf_counter_ns()
 
         # Determine Status based on narrative keywords
         thought_lower = thought.lower()
@@ -284,49 +359,48 @@ async def generate_traffic():
 
         # Calculate Savings
         json_str = json.dumps(scenario["json_equiv"])
-        # More realistic token estimation
-        json_tokens = len(json_str.split()) + len(json_str) // 4
-
-        message_data = {
-            "type": "traffic",
-            "id": str(random.randint(10000, 99999)),
-            "timestamp": "Now",
-            "src": src,
-            "dst": dst,
-            "thought": thought,
-            "slip_wire": slip_wire,
-            "anchor": anchor_name,
-            "json_equiv": json_str,
-            "gemini_reasoning": gemini_reasoning,  # NEW: Show why this anchor was chosen
-            "metrics": {
-                "json_tokens": float(f"{json_tokens:.1f}"),
-                "slip_tokens": slip_tokens,
-                "savings_pct": float(f"{(1 - slip_tokens/max(json_tokens, 1))*100:.1f}") if slip_tokens < json_tokens else 0.0
-            },
-            "advanced": {
-                "latency_ms": random.randint(150, 800) if is_fallback else random.randint(20, 150),
-                "status": status,
-                "recovery_time_ms": random.randint(1000, 5000) if status == "recovery" else 0
-            }
-        }
-
-        await manager.broadcast(message_data)
+        # Both sides through the same tokenizer; a fallback carries the raw thought
+        json_tokens, slip_tokens = count_tokens_many([json_str, thought if is_fallback else slip_wire])
+
+        record = TrafficRecord(
+            id=new_message_id(),
+            src=src,
+            dst=dst,
+            thought=thought,
+            slip_wire=slip_wire,
+            anchor=anchor_name,
+            json_equiv=scenario["json_equiv"],  # Serialized lazily on send
+            gemini_reasoning=gemini_reasoning,  # Show why this anchor was chosen
+            json_tokens=json_tokens,
+            slip_tokens=slip_tokens,
+            savings_pct=float(f"{(1 - slip_tokens/max(json_tokens, 1))*100:.1f}") if slip_tokens < json_tokens else 0.0,
+            latency_ms=random.randint(150, 800) if is_fallback else random.randint(20, 150),
+            status=status,
+            recovery_time_ms=random.randint(1000, 5000) if status == "recovery" else 0,
+            trace=trace,
+        )
+        trace.add_span("hub.build", HUB_PROCESS, build_start, time.perf_counter_ns())
+        trace.mark("hub.broadcast", HUB_PROCESS)
+
+        fanout_start = time.perf_counter_ns()
+        await manager.broadcast(record)
+        finish_trace(trace, record.id, fanout_start)
 
         # Autotuner: For fallback scenarios, use Gemini to suggest a new anchor
         if is_fallback and use_gemini:
             # Only propose if not already approved or dismissed
             existing_proposed = scenario.get("proposed_anchor", {}).get("mnemonic")
-            if not existing_proposed or (existing_proposed not in APPROVED_ANCHORS and existing_proposed not in DISMISSED_ANCHORS):
+            if not existing_proposed or (existing_proposed not in swarm.approved_anchors and existing_proposed not in swarm.dismissed_anchors):
                 await asyncio.sleep(0.5)
 
                 # Use Gemini to suggest a new anchor
                 try:
-                    suggestion = await suggest_new_anchor(thought, ANCHOR_REGISTRY)
+                    suggestion = await suggest_new_anchor(thought, swarm.anchors(ANCHOR_REGISTRY))
                     if suggestion:
                         proposal = {
                             "type": "proposal",
-                            "id": str(random.randint(10000, 99999)),
-                            "trigger_msg_id": message_data["id"],
+                            "id": new_message_id(),
+                            "trigger_msg_id": record.id,
                             "mnemonic": suggestion.get("mnemonic", "NEW-ANCHOR"),
                             "definition": suggestion.get("definition", "AI-suggested anchor"),
                             "category": suggestion.get("category", "unknown"),
@@ -339,12 +413,12 @@ async def generate_traffic():
         # Also handle hardcoded proposed anchors for backwards compatibility
         elif is_fallback and proposed:
             mnemonic = proposed["mnemonic"]
-            if mnemonic not in APPROVED_ANCHORS and mnemonic not in DISMISSED_ANCHORS:
+            if mnemonic not in swarm.approved_anchors and mnemonic not in swarm.dismissed_anchors:
                 await asyncio.sleep(0.5)
                 proposal = {
                     "type": "proposal",
-                    "id": str(random.randint(10000, 99999)),
-                    "trigger_msg_id": message_data["id"],
+                    "id": new_message_id(),
+                    "trigger_msg_id": record.id,
                     "mnemonic": mnemonic,
                     "definition": proposed["definition"]
                 }
@@ -358,8 +432,26 @@ async def generate_traffic():
 
 @app.on_event("startup")
 async def startup_event():
+    # Restore before traffic starts so approvals and cached quantizations apply immediately
+    if snapshots:
+        try:
+            await snapshots.load()
+        except Exception as e:
+            logger.error(f"Failed to restore snapshot: {e}")
+        asyncio.create_task(snapshots.run())
     # Start the simulation in the background
     asyncio.create_task(generate_traffic())
+    asyncio.create_task(swarms.run_janitor())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if snapshots:
+        try:
+            await snapshots.save()
+        except Exception as e:
+            logger.error(f"Final snapshot failed: {e}")
+    if trace_exporter:
+        trace_exporter.close()
 
 if __name__ == "__main__":
     import uvicorn
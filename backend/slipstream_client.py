@@ -1,10 +1,13 @@
 import asyncio
 import json
 import random
+import time
 import websockets
 import logging
 from typing import Optional, Dict, Any, Callable
 from slipcore import think_quantize_transmit, decode
+from tracing import TraceContext, new_message_id, trace_latency
+from tokens import count_tokens_many
 
 # Configure logger
 logger = logging.getLogger("SlipstreamClient")
@@ -33,7 +36,11 @@ class SlipstreamClient:
     async def _listen_loop(self):
         try:
             async for message in self.websocket:
+                received_ns = time.time_ns()
                 data = json.loads(message)
+                # Traced traffic gets a latency breakdown: end_to_end_ms, one_way_ms, stages
+                if isinstance(data.get("trace"), dict):
+                    data["latency"] = trace_latency(data["trace"], received_ns)
                 if self._on_message_callback:
                     self._on_message_callback(data)
         except websockets.exceptions.ConnectionClosed:
@@ -55,13 +62,16 @@ class SlipstreamClient:
         if not self.websocket:
             raise RuntimeError("Not connected. Call await connect() first.")
 
+        trace = TraceContext()
+        process = f"agent:{self.agent_name}"
+
         # 1. Quantize (Simulated logic similar to main.py generator)
         if mode == "slipstream":
             try:
-                slip_wire = think_quantize_transmit(thought, src=self.agent_name, dst=dst)
-                decoded = decode(slip_wire)
+                with trace.span("client.quantize", process):
+                    slip_wire = think_quantize_transmit(thought, src=self.agent_name, dst=dst)
+                    decoded = decode(slip_wire)
                 anchor_name = decoded.anchor.mnemonic
-                slip_tokens = len(slip_wire.split())
             except Exception:
                 # Fallback if quantization fails (e.g., no matching anchor)
                 mode = "fallback"
@@ -70,7 +80,8 @@ class SlipstreamClient:
             # Fallback/JSON mode
             slip_wire = f"[FALLBACK] {thought}"
             anchor_name = "NONE"
-            slip_tokens = len(thought.split())
+
+        build_start = time.perf_counter_ns()
 
         # 2. Calculate Metrics
         # Create a dummy JSON equiv for comparison
@@ -81,12 +92,13 @@ class SlipstreamClient:
             "timestamp": "now"
         }
         json_str = json.dumps(json_equiv)
-        json_tokens = len(json_str) / 4 # Rough approx
+        # Same tokenizer as the hub; a fallback carries the raw thought
+        json_tokens, slip_tokens = count_tokens_many([json_str, thought if mode != "slipstream" else slip_wire])
         
         # 3. Construct Payload
         payload = {
             "type": "traffic",
-            "id": str(random.randint(100000, 999999)),
+            "id": new_message_id(),
             "timestamp": "Now",
             "src": self.agent_name,
             "dst": dst,
@@ -95,9 +107,9 @@ class SlipstreamClient:
             "anchor": anchor_name,
             "json_equiv": json_str,
             "metrics": {
-                "json_tokens": float(f"{json_tokens:.1f}"),
+                "json_tokens": json_tokens,
                 "slip_tokens": slip_tokens,
-                "savings_pct": float(f"{(1 - slip_tokens/json_tokens)*100:.1f}") if slip_tokens < json_tokens else 0.0
+                "savings_pct": float(f"{(1 - slip_tokens/max(json_tokens, 1))*100:.1f}") if slip_tokens < json_tokens else 0.0
             },
             "advanced": {
                 "latency_ms": random.randint(20, 150) if mode == "slipstream" else random.randint(200, 800),
@@ -106,6 +118,10 @@ class SlipstreamClient:
             }
         }
 
+        trace.add_span("client.build", process, build_start, time.perf_counter_ns())
+        trace.mark("client.send", process)
+        payload["trace"] = trace.to_wire()
+
         # 4. Transmit
         await self.websocket.send(json.dumps(payload))
         logger.info(f"Sent: {anchor_name} -> {dst}")
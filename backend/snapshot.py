@@ -0,0 +1,173 @@
+"""
+Persistent control-plane state for warm restarts.
+
+The hub periodically snapshots its durable state (per-swarm anchor approvals,
+dismissals and registry overlays, recent history, aggregate traffic counters,
+and the Gemini quantization cache) to one gzip-compressed JSON file. On
+startup the snapshot is restored, so a redeployed instance keeps its anchor
+decisions and serves repeated messages from cache instead of re-calling
+Gemini.
+
+Capturing the state is a cheap shallow copy taken on the event loop;
+serializing, compressing and writing happen in a worker thread. Writes are
+atomic: a temp file in the same directory is fsynced and then renamed over
+the previous snapshot.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from gemini_quantizer import QuantizationCache
+from hub import SwarmRegistry
+from traffic import TrafficRecord, to_wire
+
+logger = logging.getLogger("slipstream-snapshot")
+
+SNAPSHOT_VERSION = 1
+
+
+def capture(swarms: SwarmRegistry, cache: QuantizationCache) -> Dict[str, Any]:
+    """Shallow copy of the durable state. Call on the event loop; serialize elsewhere."""
+    return {
+        "swarms": [
+            {"name": swarm.name, **swarm.durable_state(), "history": list(swarm.manager.message_history)}
+            for swarm in swarms.swarms.values()
+        ] + [
+            # Evicted swarms keep their anchor decisions, but have no history
+            {"name": name, **state, "history": []}
+            for name, state in swarms.dormant.items()
+        ],
+        "quantization_cache": cache.items(),
+    }
+
+
+def write_snapshot(state: Dict[str, Any], path: str) -> int:
+    """Serialize a captured state and atomically replace `path`. Returns bytes written."""
+    for swarm in state["swarms"]:
+        swarm["history"] = [to_wire(m) for m in swarm["history"]]
+    payload = json.dumps(
+        {"version": SNAPSHOT_VERSION, "saved_at": time.time(), **state},
+        separators=(",", ":"),
+    ).encode("utf-8")
+    data = gzip.compress(payload, compresslevel=6)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(data)
+
+
+def read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """Load a snapshot file, or None if it is missing, unreadable or from another version."""
+    try:
+        with open(path, "rb") as f:
+            state = json.loads(gzip.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError) as e:
+        # EOFError: gzip stream truncated, e.g. by a crash mid-copy
+        logger.error(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+    if state.get("version") != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring snapshot {path} with version {state.get('version')}")
+        return None
+    return state
+
+
+def restore(state: Dict[str, Any], swarms: SwarmRegistry, cache: QuantizationCache) -> int:
+    """Apply a loaded snapshot. Returns the number of swarms restored."""
+    restored = 0
+    for saved in state.get("swarms", []):
+        try:
+            swarm = swarms.get_or_create(saved["name"])
+        except (ValueError, RuntimeError) as e:
+            logger.warning(f"Skipping swarm {saved.get('name')!r} from snapshot: {e}")
+            continue
+        swarm.restore_state(saved)
+        skipped = 0
+        for m in saved.get("history", []):
+            if not isinstance(m, dict):
+                skipped += 1
+                continue
+            try:
+                swarm.manager.message_history.append(TrafficRecord.from_wire(m) if m.get("type") == "traffic" else m)
+            except (TypeError, ValueError, AttributeError):
+                skipped += 1
+        if skipped:
+            logger.warning(f"Skipped {skipped} malformed history entries for swarm {swarm.name!r}")
+        restored += 1
+    cache.load((key, result) for key, result in state.get("quantization_cache", []))
+    return restored
+
+
+class SnapshotManager:
+    """Periodic snapshots of the hub's durable state, plus restore on startup."""
+
+    def __init__(self, path: str, swarms: SwarmRegistry, cache: QuantizationCache, interval: float = 30):
+        self.path = path
+        self.swarms = swarms
+        self.cache = cache
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        # Timings of the last save and restore, for /stats/snapshot
+        self.stats: Dict[str, Any] = {"path": path, "saves": 0}
+
+    async def load(self) -> bool:
+        """Restore the snapshot at `path`, if any. Returns True if state was restored."""
+        start = time.perf_counter()
+        state = await asyncio.to_thread(read_snapshot, self.path)
+        if state is None:
+            return False
+        read_ms = (time.perf_counter() - start) * 1000
+        apply_start = time.perf_counter()
+        restored = restore(state, self.swarms, self.cache)
+        apply_ms = (time.perf_counter() - apply_start) * 1000
+        age = time.time() - state.get("saved_at", time.time())
+        self.stats.update(restore_read_ms=round(read_ms, 2), restore_apply_ms=round(apply_ms, 2))
+        logger.info(
+            f"Restored {restored} swarm(s) and {len(self.cache)} cached quantizations from {self.path} "
+            f"(read {read_ms:.1f}ms, apply {apply_ms:.1f}ms, snapshot age {age:.0f}s)"
+        )
+        return True
+
+    async def save(self) -> int:
+        """Take a snapshot now. Returns bytes written."""
+        async with self._lock:
+            start = time.perf_counter()
+            state = capture(self.swarms, self.cache)
+            capture_ms = (time.perf_counter() - start) * 1000
+            write_start = time.perf_counter()
+            size = await asyncio.to_thread(write_snapshot, state, self.path)
+            write_ms = (time.perf_counter() - write_start) * 1000
+            self.stats.update(
+                saves=self.stats["saves"] + 1,
+                bytes=size,
+                capture_ms=round(capture_ms, 2),
+                write_ms=round(write_ms, 2),
+                saved_at=time.time(),
+            )
+            logger.debug(f"Snapshot saved: {size} bytes (capture {capture_ms:.1f}ms, write {write_ms:.1f}ms)")
+            return size
+
+    async def run(self):
+        """Background task saving a snapshot every `interval` seconds."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except Exception as e:
+                logger.error(f"Snapshot failed: {e}")
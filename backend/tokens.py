@@ -0,0 +1,187 @@
+"""
+Offline token counting for Slipstream savings metrics.
+
+Token savings are the headline metric, so the hub, the Gemini quantizer and
+SlipstreamClient all count tokens through this module. The default counter is
+a pure-Python implementation of OpenAI's cl100k_base byte-pair encoding, with
+the encoding's merge ranks bundled as `cl100k_base.tiktoken.gz` (the file
+tiktoken downloads, gzipped). It needs no network access or extra packages and
+gives the same counts as tiktoken. If the third-party `regex` module is
+installed, pre-tokenization uses cl100k's exact pattern. Otherwise an `re`
+approximation is used, which differs only on letters and numerals outside the
+common Unicode classes.
+
+Counts are memoized per string, so repeated messages and JSON payloads cost a
+dict lookup. A new string costs one regex pre-tokenizer pass plus a lookup per
+pre-token; merges are only run for pre-tokens not seen before.
+
+Any object implementing TokenCounter can be installed with
+set_token_counter(), e.g. a wrapper around Gemini's count_tokens.
+"""
+
+import base64
+import gzip
+import os
+import logging
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger("slipstream-tokens")
+
+DEFAULT_VOCAB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cl100k_base.tiktoken.gz")
+
+_CL100K_PATTERN = (
+    r"(?i:'s|'t|'re|'ve|'m|'ll|'d)"
+    r"|[^\r\n\p{L}\p{N}]?\p{L}+"
+    r"|\p{N}{1,3}"
+    r"| ?[^\s\p{L}\p{N}]+[\r\n]*"
+    r"|\s*[\r\n]+"
+    r"|\s+(?!\S)"
+    r"|\s+"
+)
+
+try:
+    import regex
+
+    _PRETOKENIZE = regex.compile(_CL100K_PATTERN)
+except ImportError:
+    import re
+
+    # `re` has no \p{L} / \p{N}; [^\W\d_] and \d stand in for them
+    _PRETOKENIZE = re.compile(
+        r"(?i:'s|'t|'re|'ve|'m|'ll|'d)"
+        r"|(?:[^\r\n\w]|_)?[^\W\d_]+"
+        r"|\d{1,3}"
+        r"| ?(?:[^\s\w]|_)+[\r\n]*"
+        r"|\s*[\r\n]+"
+        r"|\s+(?!\S)"
+        r"|\s+"
+    )
+
+
+class TokenCounter(ABC):
+    """Base class for token counters."""
+
+    name = "base"
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Number of tokens in `text`."""
+
+    def count_many(self, texts: Iterable[str]) -> List[int]:
+        """Count many strings in one call. Results are in input order."""
+        return [self.count(text) for text in texts]
+
+
+class HeuristicTokenCounter(TokenCounter):
+    """~4 characters per token. Used when no vocabulary is available."""
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        return (len(text) + 3) // 4
+
+
+class BPETokenCounter(TokenCounter):
+    """Byte-pair-encoding token counter backed by a tiktoken ranks file (cl100k_base by default)."""
+
+    name = "cl100k_base"
+
+    def __init__(self, vocab_path: str = DEFAULT_VOCAB_PATH, cache_size: int = 65536, word_cache_size: int = 262144):
+        self.vocab_path = vocab_path
+        self.ranks = load_ranks(vocab_path)
+        self.word_cache_size = word_cache_size
+        self._word_cache: Dict[str, int] = {}
+        # Memoized per whole string; lru_cache is thread-safe and implemented in C
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def count(self, text: str) -> int:
+        # Replaced per instance in __init__ by the memoized _count
+        return self._count(text)
+
+    def _count(self, text: str) -> int:
+        cache = self._word_cache
+        total = 0
+        for piece in _PRETOKENIZE.findall(text):
+            n = cache.get(piece)
+            if n is None:
+                n = len(self.encode_piece(piece))
+                if len(cache) >= self.word_cache_size:
+                    cache.clear()
+                cache[piece] = n
+            total += n
+        return total
+
+    def encode_piece(self, piece: str) -> List[bytes]:
+        """Split one pre-token into tokens by merging its UTF-8 bytes, lowest rank first."""
+        data = piece.encode("utf-8")
+        ranks = self.ranks
+        if data in ranks:
+            return [data]
+        # Token boundaries as byte offsets; every single byte is a token in cl100k
+        bounds = list(range(len(data) + 1))
+        while len(bounds) > 2:
+            best = None
+            best_rank = None
+            for i in range(len(bounds) - 2):
+                rank = ranks.get(data[bounds[i]:bounds[i + 2]])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best, best_rank = i, rank
+            if best is None:
+                break
+            del bounds[best + 1]
+        return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    def count_many(self, texts: Iterable[str]) -> List[int]:
+        texts = list(texts)
+        counts = {text: self.count(text) for text in set(texts)}
+        return [counts[text] for text in texts]
+
+
+def load_ranks(path: str) -> Dict[bytes, int]:
+    """Read a tiktoken ranks file ("<base64 token> <rank>" per line, optionally gzipped) into {token: rank}."""
+    opener = gzip.open if path.endswith(".gz") else open
+    ranks = {}
+    with opener(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                token, rank = line.split()
+                ranks[base64.b64decode(token)] = int(rank)
+    return ranks
+
+
+# Process-wide counter - initialized lazily
+_token_counter: Optional[TokenCounter] = None
+_token_counter_lock = threading.Lock()
+
+def get_token_counter() -> TokenCounter:
+    """Return the active token counter, loading the bundled cl100k_base ranks on first use."""
+    global _token_counter
+    if _token_counter is not None:
+        return _token_counter
+    with _token_counter_lock:
+        if _token_counter is None:
+            try:
+                _token_counter = BPETokenCounter()
+                logger.info(f"Loaded cl100k_base token counter ({len(_token_counter.ranks)} tokens)")
+            except Exception as e:
+                logger.warning(f"Token vocabulary unavailable ({e}) - using heuristic token counts")
+                _token_counter = HeuristicTokenCounter()
+    return _token_counter
+
+
+def set_token_counter(counter: TokenCounter):
+    """Install a different token counter for the whole process."""
+    global _token_counter
+    with _token_counter_lock:
+        _token_counter = counter
+
+
+def count_tokens(text: str) -> int:
+    return get_token_counter().count(text)
+
+
+def count_tokens_many(texts: Iterable[str]) -> List[int]:
+    return get_token_counter().count_many(texts)
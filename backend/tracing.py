@@ -0,0 +1,228 @@
+"""
+End-to-end trace propagation for Slipstream traffic.
+
+A TraceContext travels with a traffic message in its `trace` field. The
+sender creates it and every stage that handles the message (client
+quantization, hub parsing, routing, fan-out) appends a span. Span times are
+microseconds from the trace origin and are measured with the local monotonic
+clock; the origin itself is a wall-clock timestamp, which is what lets a
+receiver on another host compute one-way and end-to-end latency. Cross-host
+numbers are only as good as the hosts' clock sync.
+
+Sampled traces can be written to a file in the Chrome Trace Event format,
+which opens directly in Perfetto (ui.perfetto.dev) or chrome://tracing.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+import logging
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger("slipstream-tracing")
+
+# Fraction of new traces marked for export
+SAMPLE_RATE = float(os.environ.get("SLIPSTREAM_TRACE_SAMPLE_RATE", 0.1))
+
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def new_message_id() -> str:
+    """Collision-free message ID."""
+    return uuid.uuid4().hex
+
+
+class TraceContext:
+    """Span timings for one message as it moves from sender to receivers."""
+
+    __slots__ = ("trace_id", "sampled", "origin_ns", "spans", "_mono_base")
+
+    def __init__(
+        self,
+        trace_id: Optional[str] = None,
+        sampled: Optional[bool] = None,
+        origin_ns: Optional[int] = None,
+        spans: Optional[List[Tuple[str, str, int, int]]] = None,
+    ):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.sampled = random.random() < SAMPLE_RATE if sampled is None else sampled
+        wall_ns = time.time_ns()
+        mono_ns = time.perf_counter_ns()
+        # Wall-clock time of the first stage, in epoch nanoseconds
+        self.origin_ns = wall_ns if origin_ns is None else origin_ns
+        # (name, process, start_us, duration_us); start is relative to origin_ns
+        self.spans = spans if spans is not None else []
+        # Local monotonic reading that corresponds to origin_ns
+        self._mono_base = mono_ns - (wall_ns - self.origin_ns)
+
+    def _offset_us(self, mono_ns: int) -> int:
+        return (mono_ns - self._mono_base) // 1000
+
+    def add_span(self, name: str, process: str, start_ns: int, end_ns: int):
+        """Record a span from two time.perf_counter_ns() readings."""
+        self.spans.append((name, process, self._offset_us(start_ns), (end_ns - start_ns) // 1000))
+
+    def mark(self, name: str, process: str, at_ns: Optional[int] = None):
+        """Record an instant (zero-length span), e.g. a send or receive."""
+        at_ns = time.perf_counter_ns() if at_ns is None else at_ns
+        self.spans.append((name, process, self._offset_us(at_ns), 0))
+
+    @contextmanager
+    def span(self, name: str, process: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_span(name, process, start, time.perf_counter_ns())
+
+    def to_wire(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "sampled": self.sampled,
+            "origin_ns": self.origin_ns,
+            "spans": [
+                {"name": name, "proc": process, "ts": ts, "dur": dur}
+                for name, process, ts, dur in self.spans
+            ],
+        }
+
+    @classmethod
+    def from_wire(cls, data: Dict[str, Any]) -> "TraceContext":
+        """
+        Resume a trace received from another process.
+
+        Raises:
+            ValueError: if the trace is malformed (it comes from the client, so
+                callers should drop the trace rather than the message)
+        """
+        trace_id = data.get("trace_id")
+        if not isinstance(trace_id, str) or not 0 < len(trace_id) <= 64 or not _HEX_DIGITS.issuperset(trace_id):
+            raise ValueError(f"invalid trace_id: {trace_id!r}")
+        origin_ns = data.get("origin_ns")
+        if not _is_int(origin_ns):
+            raise ValueError(f"invalid origin_ns: {origin_ns!r}")
+        raw_spans = data.get("spans", [])
+        if not isinstance(raw_spans, list):
+            raise ValueError("spans must be a list")
+        spans = []
+        for s in raw_spans:
+            if not isinstance(s, dict):
+                raise ValueError(f"invalid span: {s!r}")
+            name, process, ts, dur = s.get("name", "?"), s.get("proc", "?"), s.get("ts", 0), s.get("dur", 0)
+            if not (isinstance(name, str) and isinstance(process, str) and _is_int(ts) and _is_int(dur)):
+                raise ValueError(f"invalid span: {s!r}")
+            spans.append((name, process, ts, dur))
+        return cls(
+            trace_id=trace_id,
+            sampled=bool(data.get("sampled", False)),
+            origin_ns=origin_ns,
+            spans=spans,
+        )
+
+
+def trace_latency(trace: Dict[str, Any], received_ns: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Latency breakdown for a wire-format trace, as seen by a receiver.
+
+    Returns:
+        Dict with keys: end_to_end_ms (origin to receipt), one_way_ms (last
+        recorded stage to receipt) and stages (span name -> duration in ms)
+    """
+    received_ns = time.time_ns() if received_ns is None else received_ns
+    now_us = (received_ns - trace.get("origin_ns", received_ns)) / 1000
+    spans = trace.get("spans", [])
+    last_us = max((s["ts"] + s["dur"] for s in spans), default=0)
+    return {
+        "end_to_end_ms": round(now_us / 1000, 3),
+        "one_way_ms": round((now_us - last_us) / 1000, 3),
+        "stages": {s["name"]: round(s["dur"] / 1000, 3) for s in spans if s["dur"]},
+    }
+
+
+class TraceExporter:
+    """
+    Appends sampled traces to a Chrome Trace Event (JSON array) file.
+
+    The closing bracket is written by close(); trace viewers accept the file
+    without it, so a crashed process still leaves a readable trace.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "w", buffering=64 * 1024)
+        self._file.write("[")
+        self._first = True
+        self._pids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _write(self, event: Dict[str, Any]):
+        self._file.write(("\n" if self._first else ",\n") + json.dumps(event, separators=(",", ":")))
+        self._first = False
+
+    def _pid(self, process: str) -> int:
+        pid = self._pids.get(process)
+        if pid is None:
+            pid = self._pids[process] = len(self._pids) + 1
+            self._write({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": process}})
+        return pid
+
+    def export(self, trace: TraceContext, message_id: Optional[str] = None):
+        """Write a trace's spans if it is sampled."""
+        if not trace.sampled:
+            return
+        origin_us = trace.origin_ns // 1000
+        # One row per trace so concurrent messages don't overlap
+        try:
+            tid = int(trace.trace_id[:6], 16)
+        except ValueError:
+            tid = zlib.crc32(trace.trace_id.encode("utf-8")) & 0xFFFFFF
+        args = {"trace_id": trace.trace_id, "message_id": message_id}
+        with self._lock:
+            if self._file.closed:
+                return
+            for name, process, ts, dur in trace.spans:
+                event = {
+                    "name": name, "cat": "slipstream", "pid": self._pid(process), "tid": tid,
+                    "ts": origin_us + ts, "args": args,
+                }
+                if dur:
+                    event.update(ph="X", dur=dur)
+                else:
+                    event.update(ph="i", s="t")
+                self._write(event)
+            # Sampled traces are rare; flush each one so a killed process loses nothing
+            self._file.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.write("\n]\n")
+                self._file.close()
+
+
+def exporter_from_env() -> Optional[TraceExporter]:
+    """TraceExporter writing to $SLIPSTREAM_TRACE_FILE, or None if unset."""
+    path = os.environ.get("SLIPSTREAM_TRACE_FILE")
+    if not path:
+        return None
+    try:
+        exporter = TraceExporter(path)
+    except OSError as e:
+        logger.error(f"Failed to open trace file {path}: {e}")
+        return None
+    logger.info(f"Exporting sampled traces to {path} (sample rate {SAMPLE_RATE})")
+    return exporter
@@ -0,0 +1,174 @@
+"""
+Compact in-memory representation of Slipstream traffic messages.
+
+A traffic message on the wire is a nested dict with ~15 keys. Keeping those
+dicts around in history repeats every field name per record and duplicates
+agent/anchor strings. TrafficRecord stores the same data in __slots__ with
+interned names and numeric metrics, and only builds the wire dict when the
+message is actually sent.
+"""
+
+import json
+import math
+import sys
+from typing import Optional, Dict, Any
+
+from tracing import TraceContext
+
+_WIRE_KEYS = frozenset({
+    "type", "id", "timestamp", "src", "dst", "thought", "slip_wire", "anchor",
+    "json_equiv", "gemini_reasoning", "metrics", "advanced", "trace",
+})
+
+
+def _number(value: Any, default: float) -> float:
+    """Coerce a client-supplied metric to a number, falling back to `default`."""
+    if isinstance(value, bool):
+        return default
+    if isinstance(value, int):
+        return value
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    # NaN/Infinity would serialize to invalid JSON for the dashboard
+    return value if math.isfinite(value) else default
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern short, highly repeated strings (agent names, anchors, statuses)."""
+    if value is None:
+        return None
+    return sys.intern(str(value))
+
+
+class TrafficRecord:
+    """A single traffic message, stored compactly."""
+
+    __slots__ = (
+        "id", "timestamp", "src", "dst", "thought", "slip_wire", "anchor",
+        "json_equiv", "gemini_reasoning",
+        "json_tokens", "slip_tokens", "savings_pct",
+        "latency_ms", "status", "recovery_time_ms",
+        "trace", "extra",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        src: str,
+        dst: str,
+        thought: str,
+        slip_wire: str,
+        anchor: str,
+        json_equiv: Any,
+        json_tokens: float,
+        slip_tokens: float,
+        savings_pct: float,
+        latency_ms: int = 0,
+        status: str = "success",
+        recovery_time_ms: int = 0,
+        gemini_reasoning: Optional[str] = None,
+        timestamp: str = "Now",
+        trace: Optional[TraceContext] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ):
+        self.id = id
+        self.timestamp = _intern(timestamp)
+        self.src = _intern(src)
+        self.dst = _intern(dst)
+        self.thought = thought
+        self.slip_wire = slip_wire
+        self.anchor = _intern(anchor)
+        # Kept as given (usually the shared script dict) and serialized on send
+        self.json_equiv = json_equiv
+        self.gemini_reasoning = gemini_reasoning
+        self.json_tokens = json_tokens
+        self.slip_tokens = slip_tokens
+        self.savings_pct = savings_pct
+        self.latency_ms = latency_ms
+        self.status = _intern(status)
+        self.recovery_time_ms = recovery_time_ms
+        # Only set while the message is in flight; see ConnectionManager.broadcast
+        self.trace = trace
+        # Unknown keys from client payloads, preserved for round-tripping
+        self.extra = extra
+
+    @classmethod
+    def from_wire(cls, data: Dict[str, Any]) -> "TrafficRecord":
+        """Build a record from a wire-format traffic dict (e.g. sent by SlipstreamClient)."""
+        metrics = data.get("metrics")
+        if not isinstance(metrics, dict):
+            metrics = {}
+        advanced = data.get("advanced")
+        if not isinstance(advanced, dict):
+            advanced = {}
+        extra = {k: v for k, v in data.items() if k not in _WIRE_KEYS}
+        trace = data.get("trace")
+        try:
+            trace = TraceContext.from_wire(trace) if isinstance(trace, dict) else None
+        except ValueError:
+            # A malformed trace is dropped; the message itself is still delivered
+            trace = None
+        return cls(
+            id=str(data.get("id", "")),
+            src=data.get("src", "Unknown"),
+            dst=data.get("dst", "Unknown"),
+            thought=data.get("thought", ""),
+            slip_wire=data.get("slip_wire", ""),
+            anchor=data.get("anchor", "NONE"),
+            json_equiv=data.get("json_equiv", ""),
+            json_tokens=_number(metrics.get("json_tokens"), 0.0),
+            slip_tokens=_number(metrics.get("slip_tokens"), 0),
+            savings_pct=_number(metrics.get("savings_pct"), 0.0),
+            latency_ms=_number(advanced.get("latency_ms"), 0),
+            status=advanced.get("status", "success"),
+            recovery_time_ms=_number(advanced.get("recovery_time_ms"), 0),
+            gemini_reasoning=data.get("gemini_reasoning"),
+            timestamp=data.get("timestamp", "Now"),
+            trace=trace,
+            extra=extra or None,
+        )
+
+    def to_wire(self) -> Dict[str, Any]:
+        """Build the wire-format dict sent to websocket clients."""
+        json_equiv = self.json_equiv
+        if not isinstance(json_equiv, str):
+            json_equiv = json.dumps(json_equiv)
+        message = {
+            "type": "traffic",
+            "id": self.id,
+            "timestamp": self.timestamp,
+            "src": self.src,
+            "dst": self.dst,
+            "thought": self.thought,
+            "slip_wire": self.slip_wire,
+            "anchor": self.anchor,
+            "json_equiv": json_equiv,
+            "gemini_reasoning": self.gemini_reasoning,
+            "metrics": {
+                "json_tokens": self.json_tokens,
+                "slip_tokens": self.slip_tokens,
+                "savings_pct": self.savings_pct,
+            },
+            "advanced": {
+                "latency_ms": self.latency_ms,
+                "status": self.status,
+                "recovery_time_ms": self.recovery_time_ms,
+            },
+        }
+        if self.trace is not None:
+            message["trace"] = self.trace.to_wire()
+        if self.extra:
+            message.update(self.extra)
+        return message
+
+    def __repr__(self) -> str:
+        return f"TrafficRecord(id={self.id!r}, {self.src}->{self.dst}, anchor={self.anchor!r})"
+
+
+def to_wire(message: Any) -> Dict[str, Any]:
+    """Return the wire dict for a history entry (TrafficRecord or plain dict)."""
+    if isinstance(message, TrafficRecord):
+        return message.to_wire()
+    return message
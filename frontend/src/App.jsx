@@ -95,7 +95,19 @@ function App() {
     // Connect to WebSocket
     const connect = () => {
       const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-      const hubPath = import.meta.env.VITE_WS_URL || `${protocol}//${window.location.host}/ws/hub`;
+      const baseUrl = import.meta.env.VITE_WS_URL || `${protocol}//${window.location.host}/ws/hub`;
+      // VITE_SWARM selects a swarm namespace on the hub (default swarm when unset);
+      // it is appended to VITE_WS_URL too, ahead of any query string
+      const swarm = import.meta.env.VITE_SWARM;
+      const [basePath, baseQuery] = baseUrl.split('?');
+      const hubUrl = swarm
+        ? `${basePath.replace(/\/+$/, '')}/${encodeURIComponent(swarm)}${baseQuery ? `?${baseQuery}` : ''}`
+        : baseUrl;
+      // Ask the hub to coalesce frames into one `batch` per tick (0 = per-message delivery)
+      const tickMs = Number(import.meta.env.VITE_WS_TICK_MS ?? 100);
+      const hubPath = tickMs > 0
+        ? `${hubUrl}${hubUrl.includes('?') ? '&' : '?'}tick_ms=${tickMs}`
+        : hubUrl;
       console.log("Attempting WS Connection to:", hubPath); // DEBUG
       ws.current = new WebSocket(hubPath);
 
@@ -104,15 +116,23 @@ function App() {
         console.log("Connected to Control Plane");
       };
 
+      // Apply a list of frames with at most one state update per kind
+      const applyFrames = (frames) => {
+        const traffic = frames.filter(m => m.type === 'traffic');
+        const newProposals = frames.filter(m => m.type === 'proposal');
+        if (traffic.length) setMessages(prev => [...prev, ...traffic]);
+        if (newProposals.length) setProposals(prev => [...prev, ...newProposals]);
+      };
+
       ws.current.onmessage = (event) => {
         const data = JSON.parse(event.data);
         if (data.type === 'history_sync') {
           setMessages(data.messages.filter(m => m.type === 'traffic'));
           setProposals(data.messages.filter(m => m.type === 'proposal'));
-        } else if (data.type === 'traffic') {
-          setMessages(prev => [...prev, data]);
-        } else if (data.type === 'proposal') {
-          setProposals(prev => [...prev, data]);
+        } else if (data.type === 'batch') {
+          applyFrames(data.messages);
+        } else {
+          applyFrames([data]);
         }
       };
 
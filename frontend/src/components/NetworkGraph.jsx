@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useMemo } from 'react';
+import React, { useEffect, useState, useMemo, useRef } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Server, Database, Brain, Globe, Laptop, Bot, User, Cpu } from 'lucide-react';
 import { cn } from '../lib/utils.js';
@@ -24,76 +24,82 @@ const COLORS = {
 
 const DEFAULT_COLOR = { text: "text-gray-400", bg: "bg-gray-500/20", border: "border-gray-500/40", glow: "shadow-gray-500/30" };
 
-export function NetworkGraph({ messages }) {
-    const [nodes, setNodes] = useState(new Set(["Planner", "Executor", "Frontend", "Backend", "QA"]));
-    const [particles, setParticles] = useState([]);
+// Batched delivery can add many messages per render; cap how many particles one update spawns
+const MAX_PARTICLES_PER_UPDATE = 20;
 
-    // Auto-discover nodes from traffic
-    useEffect(() => {
-        if (messages.length === 0) return;
+// Calculate Layout (Circular with specific positions matching ui.png)
+function computeLayout(nodes) {
+    const nodeList = Array.from(nodes);
+    const count = nodeList.length;
+    const centerX = 250;
+    const centerY = 220;
+    const radius = 160;
 
-        const latestMsg = messages[messages.length - 1];
-        setNodes(prev => {
-            const next = new Set(prev);
-            if (!next.has(latestMsg.src)) next.add(latestMsg.src);
-            if (!next.has(latestMsg.dst)) next.add(latestMsg.dst);
-            return next.size > prev.size ? next : prev;
-        });
-    }, [messages]);
+    const positions = {};
 
-    // Calculate Layout (Circular with specific positions matching ui.png)
-    const layout = useMemo(() => {
-        const nodeList = Array.from(nodes);
-        const count = nodeList.length;
-        const centerX = 250;
-        const centerY = 220;
-        const radius = 160;
+    nodeList.forEach((node, index) => {
+        // Position nodes around the circle, starting from top-left
+        const angle = (index / count) * 2 * Math.PI - (Math.PI / 2) - (Math.PI / 5);
 
-        const positions = {};
+        const x = centerX + radius * Math.cos(angle);
+        const y = centerY + radius * Math.sin(angle);
 
-        nodeList.forEach((node, index) => {
-            // Position nodes around the circle, starting from top-left
-            const angle = (index / count) * 2 * Math.PI - (Math.PI / 2) - (Math.PI / 5);
+        positions[node] = {
+            x,
+            y,
+            icon: ICONS[node] || Bot,
+            colors: COLORS[node] || DEFAULT_COLOR
+        };
+    });
 
-            const x = centerX + radius * Math.cos(angle);
-            const y = centerY + radius * Math.sin(angle);
+    return positions;
+}
 
-            positions[node] = {
-                x,
-                y,
-                icon: ICONS[node] || Bot,
-                colors: COLORS[node] || DEFAULT_COLOR
-            };
-        });
+export function NetworkGraph({ messages }) {
+    const [nodes, setNodes] = useState(new Set(["Planner", "Executor", "Frontend", "Backend", "QA"]));
+    const [particles, setParticles] = useState([]);
+    // How far into `messages` we have processed, and the last message seen there
+    const seen = useRef({ count: 0, last: null });
 
-        return positions;
-    }, [nodes]);
+    const layout = useMemo(() => computeLayout(nodes), [nodes]);
 
-    // Particle Logic
+    // Discover nodes and spawn particles for every message added since the last update
     useEffect(() => {
-        if (messages.length === 0) return;
-        const latestMsg = messages[messages.length - 1];
-
-        if (!layout[latestMsg.src] || !layout[latestMsg.dst]) return;
+        const { count, last } = seen.current;
+        const appended = count <= messages.length && (count === 0 || messages[count - 1] === last);
+        // history_sync replaces the list; treat that as all-new
+        const fresh = appended ? messages.slice(count) : messages;
+        seen.current = { count: messages.length, last: messages[messages.length - 1] ?? null };
+        if (fresh.length === 0) return;
 
-        const srcNode = layout[latestMsg.src];
-        const dstNode = layout[latestMsg.dst];
-
-        const id = Math.random().toString(36);
-        const isSlipstream = !latestMsg.json_equiv || (latestMsg.metrics && latestMsg.metrics.savings_pct > 0);
-
-        setParticles(prev => [...prev, {
-            id,
-            x1: srcNode.x,
-            y1: srcNode.y,
-            x2: dstNode.x,
-            y2: dstNode.y,
-            isSlipstream
-        }]);
+        const nextNodes = new Set(nodes);
+        fresh.forEach(msg => {
+            nextNodes.add(msg.src);
+            nextNodes.add(msg.dst);
+        });
+        if (nextNodes.size > nodes.size) setNodes(nextNodes);
 
-        setTimeout(() => setParticles(prev => prev.filter(p => p.id !== id)), 2000);
+        const positions = nextNodes.size > nodes.size ? computeLayout(nextNodes) : layout;
+        const spawned = fresh.slice(-MAX_PARTICLES_PER_UPDATE)
+            .filter(msg => positions[msg.src] && positions[msg.dst])
+            .map(msg => {
+                const srcNode = positions[msg.src];
+                const dstNode = positions[msg.dst];
+                return {
+                    id: Math.random().toString(36),
+                    x1: srcNode.x,
+                    y1: srcNode.y,
+                    x2: dstNode.x,
+                    y2: dstNode.y,
+                    isSlipstream: !msg.json_equiv || (msg.metrics && msg.metrics.savings_pct > 0)
+                };
+            });
+        if (spawned.length === 0) return;
 
-    }, [messages, layout]);
+        const ids = new Set(spawned.map(p => p.id));
+        setParticles(prev => [...prev, ...spawned]);
+        setTimeout(() => setParticles(prev => prev.filter(p => !ids.has(p.id))), 2000);
+    }, [messages, nodes, layout]);
 
     return (
         <div className="w-full h-[500px] glass-card rounded-2xl relative overflow-hidden">
@@ -10,7 +10,8 @@ export function Registry() {
     useEffect(() => {
         const apiBase = import.meta.env.VITE_API_BASE || 'http://localhost:8000';
         console.log("Fetching anchors from:", apiBase); // DEBUG
-        fetch(`${apiBase}/anchors`)
+        const swarm = import.meta.env.VITE_SWARM;
+        fetch(swarm ? `${apiBase}/anchors?swarm=${encodeURIComponent(swarm)}` : `${apiBase}/anchors`)
             .then(res => res.json())
             .then(data => {
                 setAnchors(data);